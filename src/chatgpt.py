@@ -3,19 +3,33 @@
 import atexit
 import click
 import datetime
+import functools
+import orjson
 import os
 import requests
 import sys
+import threading
+import tiktoken
 import yaml
-import json
 import re
 
+from contextlib import nullcontext
+from dataclasses import dataclass, field
 from pathlib import Path
 from prompt_toolkit import PromptSession, HTML
 from prompt_toolkit.history import FileHistory
+from requests.adapters import HTTPAdapter
 from rich.console import Console
+from rich.live import Live
 from rich.markdown import Markdown
 from rich.pretty import pprint
+from urllib3.util.retry import Retry
+
+# Use the libyaml C parser when PyYAML was built with it
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
 
 WORKDIR = Path(__file__).parent
 BASE_ENDPOINT = "https://api.openai.com/v1"
@@ -29,6 +43,8 @@ CONFIG_FILE = Path(WORKDIR, "../config.yaml")
 
 BASE_ENDPOINT = "https://api.openai.com/v1"
 ENV_VAR = "OPENAI_API_KEY"
+# Seconds to wait for the connection and between two chunks of the streamed response
+REQUEST_TIMEOUT = (10, 60)
 
 PRICING_RATE = {
     "gpt-3.5-turbo": {"prompt": 0.0015, "completion": 0.002},
@@ -40,28 +56,92 @@ PRICING_RATE = {
     "gpt-4-32k-0613": {"prompt": 0.06, "completion": 0.12},
     "gpt-3.5-turbo-16k-0613": {"prompt": 0.003, "completion": 0.004},
 }
+# Same rates in nano-dollars per token, so that expenses are computed with exact integer arithmetic
+PRICING_RATE_NANO = {
+    model: {kind: round(rate * 1_000_000) for kind, rate in rates.items()}
+    for model, rates in PRICING_RATE.items()
+}
+
+# Maximum number of tokens (prompt + completion) accepted by each model
+MODEL_CONTEXT_LENGTH = {
+    "gpt-3.5-turbo": 4096,
+    "gpt-3.5-turbo-0613": 4096,
+    "gpt-3.5-turbo-16k": 16384,
+    "gpt-4": 8192,
+    "gpt-4-0613": 8192,
+    "gpt-4-32k": 32768,
+    "gpt-4-32k-0613": 32768,
+    "gpt-3.5-turbo-16k-0613": 16384,
+}
+# Tokens kept free for the response when max_tokens is not configured
+DEFAULT_COMPLETION_TOKENS = 1024
+
+# Extracts the context limit and the request size from a context_length_exceeded error
+CTX_LEN_RE = re.compile(
+    r"This model's maximum context length is (?P<a>\d+) tokens.*?your messages resulted in (?P<b>\d+) tokens"
+)
+
+# Tokens added by the chat format around every message and to prime the reply
+TOKENS_PER_MESSAGE = 3
+TOKENS_PER_REPLY = 3
+
+
+@dataclass(slots=True)
+class ConversationState:
+    """
+    Messages history and token counters of a conversation
+    """
+
+    # It's mandatory to pass the messages at each API call in order to have a conversation
+    messages: list = field(default_factory=list)
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    # False when the tokens couldn't be counted, the counters are then meaningless
+    usage_available: bool = True
+    # Cached token count of each message, parallel to the messages list
+    token_counts: list[int] = field(default_factory=list)
+    # Cached JSON serialization of each message, parallel to the messages list
+    encoded_messages: list[bytes] = field(default_factory=list)
 
 
-# Initialize the messages history list
-# It's mandatory to pass it at each API call in order to have a conversation
-messages = []
-# Initialize the token counters
-prompt_tokens = 0
-completion_tokens = 0
 # Initialize the console
 console = Console()
+# Initialize the HTTP session, the connection is kept alive and reused at each API call.
+# Connection failures and overloaded or rate limited responses are retried with backoff before giving up.
+http_session = requests.Session()
+http_session.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=4,
+        max_retries=Retry(
+            total=5,
+            connect=5,
+            # A request that reached the server may have started a billed completion, never send it again.
+            # Read errors are raised as they are, so that read timeouts surface as requests.Timeout
+            read=False,
+            status=5,
+            backoff_factor=0.3,
+            # 429 is only retried when the server sends Retry-After, an exhausted quota can never succeed
+            status_forcelist=(502, 503),
+            allowed_methods=frozenset({"GET", "POST"}),
+            raise_on_status=False,
+        ),
+    ),
+)
 
 
 def load_config(config_file: str) -> dict:
     """
     Read a YAML config file and returns it's content as a dictionary
     """
-    if not Path(config_file).exists():
+    try:
+        # Hand libyaml the raw bytes in one read, it decodes them itself
+        with open(config_file, "rb") as file:
+            config = yaml.load(file.read(), Loader=SafeLoader)
+    except FileNotFoundError:
         raise FileNotFoundError("No config.yaml found")
 
-    with open(config_file) as file:
-        config = yaml.load(file, Loader=yaml.FullLoader)
-
     return config
 
 
@@ -69,177 +149,426 @@ def load_history_data(history_file: str) -> dict:
     """
     Read a session history json file and return its content
     """
-    with open(history_file) as file:
-        content = json.loads(file.read())
+    with open(history_file, "rb") as file:
+        content = orjson.loads(file.read())
 
     return content
 
 
-def add_markdown_system_message() -> None:
+@functools.lru_cache(maxsize=None)
+def get_encoding(model: str) -> tiktoken.Encoding | None:
+    """
+    Return the tiktoken encoding for the model, falling back to cl100k_base for unknown models.
+    tiktoken downloads the encoding on first use, return None if it can't be loaded.
+    """
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except (requests.RequestException, OSError, ValueError) as e:
+        console.print(
+            f"Could not load the tokenizer, token counting and history trimming are disabled: {e}",
+            style="yellow",
+        )
+        return None
+
+
+def count_prompt_tokens(model: str, state: ConversationState) -> int | None:
+    """
+    Estimate the number of prompt tokens of the messages history, streamed responses don't report usage.
+    Only the messages added since the last call are encoded, the others come from the cache.
+    Return None if the encoding is not available.
+    """
+    encoding = get_encoding(model)
+    if encoding is None:
+        return None
+
+    for message in state.messages[len(state.token_counts):]:
+        state.token_counts.append(
+            TOKENS_PER_MESSAGE
+            + len(encoding.encode_ordinary(message["role"]))
+            + len(encoding.encode_ordinary(message["content"]))
+        )
+
+    return sum(state.token_counts) + TOKENS_PER_REPLY
+
+
+def encode_messages(state: ConversationState) -> bytes:
+    """
+    Serialize the messages history as a JSON array.
+    Only the messages added since the last call are serialized, the others come from the cache.
+    """
+    for message in state.messages[len(state.encoded_messages):]:
+        state.encoded_messages.append(orjson.dumps(message))
+
+    return b"[" + b",".join(state.encoded_messages) + b"]"
+
+
+def pop_message(state: ConversationState) -> dict:
+    """
+    Remove the last message from the history along with its cached token count and serialization
+    """
+    del state.token_counts[len(state.messages) - 1:]
+    del state.encoded_messages[len(state.messages) - 1:]
+    return state.messages.pop()
+
+
+def trim_messages(config: dict, state: ConversationState) -> int | None:
+    """
+    Drop the oldest turns until the prompt and the response fit in the model context length.
+    System messages and the last user message are always kept, if they don't fit on their own
+    the message is discarded without sending it. Return the number of prompt tokens.
+    """
+    model = config["model"]
+    num_tokens = count_prompt_tokens(model, state)
+
+    if num_tokens is None or model not in MODEL_CONTEXT_LENGTH:
+        return num_tokens
+
+    budget = MODEL_CONTEXT_LENGTH[model] - config.get("max_tokens", DEFAULT_COMPLETION_TOKENS)
+
+    required = TOKENS_PER_REPLY + state.token_counts[-1] + sum(
+        count
+        for message, count in zip(state.messages, state.token_counts)
+        if message["role"] == "system"
+    )
+    if required > budget:
+        console.print(
+            f"Message too long, it needs {required} tokens with the system messages but only {budget} are available",
+            style="red bold",
+        )
+        pop_message(state)
+        raise KeyboardInterrupt
+
+    dropped = 0
+    i = 0
+    while num_tokens > budget and i < len(state.messages) - 1:
+        if state.messages[i]["role"] == "system":
+            i += 1
+            continue
+        # Drop a whole turn, the user message along with the replies that follow it
+        end = i + 1
+        while end < len(state.messages) - 1 and state.messages[end]["role"] == "assistant":
+            end += 1
+        num_tokens -= sum(state.token_counts[i:end])
+        del state.token_counts[i:end]
+        # The messages may not have been serialized yet
+        del state.encoded_messages[i:end]
+        del state.messages[i:end]
+        dropped += end - i
+
+    if dropped:
+        console.print(
+            f"Dropped the {dropped} oldest messages to fit the context length", style="yellow"
+        )
+
+    return num_tokens
+
+
+def add_markdown_system_message(state: ConversationState) -> None:
     """
     Try to force ChatGPT to always respond with well formatted code blocks and tables if markdown is enabled.
     """
     instruction = "Always use code blocks with the appropriate language tags. If asked for a table always format it using Markdown syntax."
-    messages.append({"role": "system", "content": instruction})
+    state.messages.append({"role": "system", "content": instruction})
 
 
 def calculate_expense(
     prompt_tokens: int,
     completion_tokens: int,
-    prompt_pricing: float,
-    completion_pricing: float,
-) -> float:
+    prompt_pricing: int,
+    completion_pricing: int,
+) -> int:
     """
-    Calculate the expense, given the number of tokens and the pricing rates
+    Calculate the expense in nano-dollars, given the number of tokens and the per token pricing rates
     """
-    expense = ((prompt_tokens / 1000) * prompt_pricing) + (
-        (completion_tokens / 1000) * completion_pricing
-    )
-
-    # Format to display in decimal notation rounded to 6 decimals
-    expense = "{:.6f}".format(round(expense, 6))
+    return prompt_tokens * prompt_pricing + completion_tokens * completion_pricing
 
-    return expense
 
-
-def display_expense(model: str) -> None:
+def display_expense(model: str, state: ConversationState) -> None:
     """
     Given the model used, display total tokens used and estimated expense
     """
+    if not state.usage_available:
+        console.print("\n[green bold][?] 🖕 token usage unavailable")
+        return
+
     total_expense = calculate_expense(
-        prompt_tokens,
-        completion_tokens,
-        PRICING_RATE[model]["prompt"],
-        PRICING_RATE[model]["completion"],
+        state.prompt_tokens,
+        state.completion_tokens,
+        PRICING_RATE_NANO[model]["prompt"],
+        PRICING_RATE_NANO[model]["completion"],
     )
+    # Display in decimal notation rounded to 6 decimals
     console.print(
-        f"\n[green bold][{prompt_tokens + completion_tokens}] 🖕 ${total_expense}"
+        f"\n[green bold][{state.prompt_tokens + state.completion_tokens}] 🖕 ${total_expense / 1_000_000_000:.6f}"
     )
 
 
-def start_prompt(session: PromptSession, config: dict) -> None:
+def handle_ok(r: requests.Response, config: dict, state: ConversationState) -> None:
     """
-    Ask the user for input, build the request and perform it
+    Stream the response, display it and update the message history and token counters
     """
+    content = ""
+    error = None
+
+    # The markdown is rebuilt from the response received so far at each refresh,
+    # not at each token, so the redraws are capped whatever the token rate
+    live = Live(
+        console=console,
+        refresh_per_second=8,
+        vertical_overflow="visible",
+        get_renderable=lambda: Markdown(content.strip()),
+    ) if config["markdown"] else nullcontext()
+
+    console.line()
+    # The body is read here, outside the request error handling of start_prompt
+    try:
+        with live:
+            # The lines are kept as bytes, decoding them first would also split them on
+            # unicode line separators that can appear inside the JSON strings
+            for line in r.iter_lines():
+                if not line.startswith(b"data: "):
+                    continue
+                data = line[len(b"data: "):]
+                if data == b"[DONE]":
+                    break
+
+                event = orjson.loads(data)
+                if "error" in event:
+                    error = event["error"]
+                    break
+
+                delta = event["choices"][0]["delta"]
+                token = delta.get("content") or ""
+                if not content:
+                    token = token.lstrip()
+                content += token
+
+                if not config["markdown"]:
+                    console.out(token, end="", highlight=False)
+    except requests.RequestException as e:
+        console.line()
+        print(e)
+        console.print("Connection lost while receiving the response, try again...", style="red bold")
+        pop_message(state)
+        raise KeyboardInterrupt
+    except (KeyError, IndexError, orjson.JSONDecodeError) as e:
+        console.line()
+        console.print(f"Invalid event in the streamed response ({e!r}), try again...", style="red bold")
+        pop_message(state)
+        raise KeyboardInterrupt
 
-    # TODO: Refactor to avoid a global variables
-    global prompt_tokens, completion_tokens
+    if error is not None:
+        console.line()
+        console.print("The API returned an error while streaming the response:", style="red bold")
+        pprint(error)
+        pop_message(state)
+        raise KeyboardInterrupt
 
-    headers = {
-        "Content-Type":  f"application/json",
-        "User-Agent":    f"Mozilla/5.0",
-        "Authorization": f"Bearer {config['api-key']}",
-    }
+    if not config["markdown"]:
+        console.line()
+    console.line()
+
+    # Update token counters and message history
+    message = {"role": "assistant", "content": content}
+    encoding = get_encoding(config["model"])
+    if encoding is None:
+        state.usage_available = False
+        state.messages.append(message)
+        return
+
+    num_completion_tokens = len(encoding.encode_ordinary(content))
+    state.prompt_tokens += count_prompt_tokens(config["model"], state)
+    state.completion_tokens += num_completion_tokens
+    state.messages.append(message)
+    # The response has just been encoded, cache its count so it isn't encoded again next turn
+    state.token_counts.append(
+        TOKENS_PER_MESSAGE + len(encoding.encode_ordinary("assistant")) + num_completion_tokens
+    )
 
-    message = session.prompt(HTML(f"<b>[{prompt_tokens + completion_tokens}] >>> </b>"))
 
-    if message.lower() == "/q":
+def handle_bad_request(r: requests.Response, config: dict, state: ConversationState) -> None:
+    """
+    Report an invalid request, such as one exceeding the model context length
+    """
+    response = r.json()
+
+    try:
+        if "error" in response:
+            try:
+                err_codeword, err_message = response["error"]["code"], response["error"]["message"]
+                raise KeyError
+            except KeyError:
+                console.print(f"Invalid request please review API response:", style="bold red")
+                pprint(response)
+                raise EOFError
+        else:
+            raise AssertionError
+
+    except AssertionError:
+        console.print(f"Invalid request and could not find error details in API 404 response:", style="bold red")
+        pprint(response)
         raise EOFError
-    if message.lower() == "":
-        raise KeyboardInterrupt
 
-    messages.append({"role": "user", "content": message})
+    if err_codeword == "context_length_exceeded":
+        try:
+            re_ctx_msg = CTX_LEN_RE.search(err_message).groupdict()
+
+            ctx_maxlen, ctx_putlen, ctx_exceed = (
+                re_ctx_msg["a"],
+                re_ctx_msg["b"],
+                int(re_ctx_msg["b"]) - int(re_ctx_msg["a"]),
+            )
+            console.print(
+                f"Maximum context length ({ctx_maxlen}) exceeded. Try reducing {ctx_exceed} from the source total ({ctx_putlen})",
+                style="red bold",
+            )
+            raise EOFError
+
+        except Exception as e:
+            console.print("Maximum context length exceeded.", style="red bold")
+            raise EOFError
+
+
+def handle_unauthorized(r: requests.Response, config: dict, state: ConversationState) -> None:
+    """
+    Report an invalid API key
+    """
+    console.print("Invalid API Key", style="bold red")
+    raise EOFError
+
+
+def handle_rate_limit(r: requests.Response, config: dict, state: ConversationState) -> None:
+    """
+    Report an exhausted quota, or a rate limit still exceeded after the retries
+    """
+    try:
+        err_codeword = r.json()["error"]["code"]
+    except (ValueError, KeyError, TypeError):
+        err_codeword = None
+
+    if err_codeword == "insufficient_quota":
+        console.print("Maximum monthly limit exceeded", style="bold red")
+    else:
+        console.print("Rate limit exceeded, try again later", style="bold red")
+    pop_message(state)
+    raise KeyboardInterrupt
 
+
+def handle_overloaded(r: requests.Response, config: dict, state: ConversationState) -> None:
+    """
+    Report a server still overloaded after the retries
+    """
+    console.print("The server seems to be overloaded, retries exhausted, try again", style="bold red")
+    pop_message(state)
+    raise KeyboardInterrupt
+
+
+def handle_unknown(r: requests.Response, config: dict, state: ConversationState) -> None:
+    """
+    Report an unexpected status code
+    """
+    console.print(f"Unknown error, status code {r.status_code}", style="bold red")
+    console.print(r.json())
+    raise EOFError
+
+
+# Response handler of each status code, resolved with a single lookup instead of an if/elif chain
+RESPONSE_HANDLERS = {
+    200: handle_ok,
+    400: handle_bad_request,
+    401: handle_unauthorized,
+    429: handle_rate_limit,
+    502: handle_overloaded,
+    503: handle_overloaded,
+}
+
+
+@functools.lru_cache(maxsize=None)
+def build_headers(api_key: str) -> dict:
+    """
+    Build the request headers, they are the same for every request of the session
+    """
+    return {
+        "Content-Type":  f"application/json",
+        "User-Agent":    f"Mozilla/5.0",
+        "Authorization": f"Bearer {api_key}",
+    }
+
+
+@functools.lru_cache(maxsize=None)
+def build_body_prefix(model: str, temperature: float, max_tokens: int | None) -> bytes:
+    """
+    Serialize the body parameters, without the closing brace so that the messages can be appended.
+    They are the same for every request of the session.
+    """
     # Base body parameters
     body = {
-        "model":       config["model"],
-        "temperature": config["temperature"],
-        "messages":    messages,
+        "model":       model,
+        "temperature": temperature,
+        "stream":      True,
     }
     # Optional parameter
-    if "max_tokens" in config:
-        body["max_tokens"] = config["max_tokens"]
-
-    try:
-        r = requests.post(
-            f"{BASE_ENDPOINT}/chat/completions", headers=headers, json=body
-        )
-    except requests.ConnectionError as e:
-        print(e)
-        console.print("Connection error, try again...", style="red bold")
-        messages.pop()
-        raise KeyboardInterrupt
-    except requests.Timeout:
-        console.print("Connection timed out, try again...", style="red bold")
-        messages.pop()
-        raise KeyboardInterrupt
+    if max_tokens is not None:
+        body["max_tokens"] = max_tokens
 
-    if r.status_code == 200:
-        response = r.json()
+    return orjson.dumps(body)[:-1]
 
-        message_response = response["choices"][0]["message"]
-        usage_response   = response["usage"]
 
-        console.line()
-        if config["markdown"]:
-            console.print(Markdown(message_response["content"].strip()))
-        else:
-            console.print(message_response["content"].strip())
-        console.line()
+def warm_up_connection(api_key: str) -> None:
+    """
+    Connect to the API ahead of the first request, so that it doesn't pay for the DNS lookup and TLS handshake.
+    The connection stays in the HTTP session pool once the response is read.
+    """
+    try:
+        http_session.get(f"{BASE_ENDPOINT}/models", headers=build_headers(api_key), timeout=REQUEST_TIMEOUT)
+    except requests.RequestException:
+        # Any connection error is reported by the first request
+        pass
 
-        # Update message history and token counters
-        messages.append(message_response)
-        prompt_tokens += usage_response["prompt_tokens"]
-        completion_tokens += usage_response["completion_tokens"]
 
-    elif r.status_code == 400:
-        response = r.json()
+def start_prompt(session: PromptSession, config: dict, state: ConversationState) -> None:
+    """
+    Ask the user for input, build the request and perform it
+    """
 
-        try:
-            if "error" in response:
-                try:
-                    err_codeword, err_message = response["error"]["code"], response["error"]["message"]
-                    raise KeyError
-                except KeyError:
-                    console.print(f"Invalid request please review API response:", style="bold red")
-                    pprint(response)
-                    raise EOFError
-            else:
-                raise AssertionError
-
-        except AssertionError:
-            console.print(f"Invalid request and could not find error details in API 404 response:", style="bold red")
-            pprint(response)
-            raise EOFError
+    total_tokens = state.prompt_tokens + state.completion_tokens if state.usage_available else "?"
+    message = session.prompt(HTML(f"<b>[{total_tokens}] >>> </b>"))
 
-        if err_codeword == "context_length_exceeded":
-            try:
-                m = r"This model's maximum context length is (?P<a>\d+) tokens.*?your messages resulted in (?P<b>\d+) tokens"
-                re_ctx_msg = re.search(m, err_message).groupdict()
-
-                ctx_maxlen, ctx_putlen, ctx_exceed = (
-                    re_ctx_msg["a"],
-                    re_ctx_msg["b"],
-                    int(re_ctx_msg["b"]) - int(re_ctx_msg["a"]),
-                )
-                console.print(
-                    f"Maximum context length ({ctx_maxlen}) exceeded. Try reducing {ctx_exceed} from the source total ({ctx_putlen})",
-                    style="red bold",
-                )
-                raise EOFError
+    if message.lower() == "/q":
+        raise EOFError
+    if message.lower() == "":
+        raise KeyboardInterrupt
 
-            except Exception as e:
-                console.print("Maximum context length exceeded.", style="red bold")
-                raise EOFError
+    state.messages.append({"role": "user", "content": message})
+    trim_messages(config, state)
 
-    elif r.status_code == 401:
-        console.print("Invalid API Key", style="bold red")
-        raise EOFError
+    headers = build_headers(config["api-key"])
+    # The messages are appended to the serialized body to reuse their cached serialization
+    body_prefix = build_body_prefix(config["model"], config["temperature"], config.get("max_tokens"))
+    payload = body_prefix + b',"messages":' + encode_messages(state) + b"}"
 
-    elif r.status_code == 429:
-        console.print("Rate limit or maximum monthly limit exceeded", style="bold red")
-        messages.pop()
+    try:
+        # The spinner is animated by rich in its own thread while the request is in flight,
+        # until the response headers arrive and the streaming starts
+        with console.status("Waiting for the response..."):
+            r = http_session.post(
+                f"{BASE_ENDPOINT}/chat/completions", headers=headers, data=payload, stream=True,
+                timeout=REQUEST_TIMEOUT,
+            )
+    except requests.ConnectionError as e:
+        print(e)
+        console.print("Connection error, try again...", style="red bold")
+        pop_message(state)
         raise KeyboardInterrupt
-
-    elif r.status_code == 502 or r.status_code == 503:
-        console.print("The server seems to be overloaded, try again", style="bold red")
-        messages.pop()
+    except requests.Timeout:
+        console.print("Connection timed out, try again...", style="red bold")
+        pop_message(state)
         raise KeyboardInterrupt
 
-    else:
-        console.print(f"Unknown error, status code {r.status_code}", style="bold red")
-        console.print(r.json())
-        raise EOFError
+    RESPONSE_HANDLERS.get(r.status_code, handle_unknown)(r, config, state)
 
 
 @click.command()
@@ -286,26 +615,33 @@ def main(context, api_key, model, multiline) -> None:
     if model:
         config["model"] = model.strip()
 
+    # Connect in the background while the user types the first message
+    threading.Thread(target=warm_up_connection, args=(config["api-key"],), daemon=True).start()
+
+    state = ConversationState()
+
     # Run the display expense function when exiting the script
-    atexit.register(display_expense, model=config["model"])
+    atexit.register(display_expense, model=config["model"], state=state)
 
     console.print(f"skynet: [green bold]activated")
 
     # Add the system message for code blocks in case markdown is enabled in the config file
     if config["markdown"]:
-        add_markdown_system_message()
+        add_markdown_system_message(state)
 
     # Context from the command line option
+    # All the files are sent as a single system message to save the per-message token overhead
     if context:
         for c in context:
             console.print(f"Context file: [green bold]{c.name}")
-            messages.append({"role": "system", "content": c.read().strip()})
+        combined = "\n\n---\n\n".join(c.read().strip() for c in context)
+        state.messages.append({"role": "system", "content": combined})
 
     console.rule()
 
     while True:
         try:
-            start_prompt(session, config)
+            start_prompt(session, config, state)
         except KeyboardInterrupt:
             continue
         except EOFError as e: